@@ -1,13 +1,18 @@
 import streamlit as st
 from google import genai
+from google.genai import types
+import httpx
 import traceback
+import urllib.request
+import asyncio
+import importlib.util
 import io
-try:
-    from docx import Document
-    DOCX_AVAILABLE = True
-except Exception:
-    Document = None
-    DOCX_AVAILABLE = False
+import re
+import threading
+import time
+
+# python-docx is optional and only imported when a Word export is built
+DOCX_AVAILABLE = importlib.util.find_spec("docx") is not None
 
 # ---------------- PAGE CONFIG ----------------
 st.set_page_config(
@@ -23,113 +28,85 @@ st.markdown("Research powered by **Google Gemini API**")
 st.sidebar.header("🔑 API Key")
 api_key = st.sidebar.text_input("Enter Gemini API Key", type="password")
 
+# ---------------- CLIENT ----------------
+# Connection pool limits for the SDK's httpx clients, sized for concurrent sessions
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=50)
+
+# Bounded so stale or mistyped keys don't keep clients alive for the process lifetime
+@st.cache_resource(show_spinner=False, max_entries=20)
+def get_client(api_key):
+    """Return a genai.Client for this API key, shared across reruns and sessions."""
+    return genai.Client(
+        api_key=api_key,
+        http_options=types.HttpOptions(client_args={"limits": HTTP_LIMITS}),
+    )
+
 # ---------------- MODEL LISTING & SELECTION ----------------
+@st.cache_data(ttl=3600, show_spinner="Loading available models...")
 def list_models(api_key):
     """Return a list of available model names using the provided API key.
 
-    Tries several SDK call shapes, surfaces errors in the sidebar, and parses
-    different response shapes.
+    Uses the documented ``client.models.list()`` pager; the other SDK call
+    shapes are only probed by ``list_models_debug``. Cached per key, so it
+    must not write to the page. Failures raise RuntimeError, which
+    st.cache_data does not cache, so the next rerun retries.
     """
     try:
-        client = genai.Client(api_key=api_key)
+        client = get_client(api_key)
     except Exception as e:
-        st.sidebar.error(f"Client init error: {e}")
-        return []
-
-    resp = None
-    errors = []
-
-    # Try common call shapes; prefer client.models.list() which returns a pager
-    try_calls = [
-        ("client.models.list()", lambda c: c.models.list() if hasattr(c, "models") and hasattr(c.models, "list") else None),
-        ("client.list_models()", lambda c: c.list_models() if hasattr(c, "list_models") else None),
-        ("client.list()", lambda c: c.list() if hasattr(c, "list") else None),
-    ]
-
-    for name, fn in try_calls:
-        try:
-            candidate = fn(client)
-            if candidate is not None:
-                resp = candidate
-                break
-        except Exception as e:
-            errors.append(f"{name} -> {e}")
-
-    if resp is None:
-        st.sidebar.error("Could not list models. See attempts below:")
-        for e in errors:
-            st.sidebar.text(e)
-        return []
+        raise RuntimeError(f"Client init error: {e}")
 
-    # Normalize response to a list of model dicts/objects or iterate pager
     models = []
-
-    # If resp is a dict-like container
-    if isinstance(resp, dict):
-        candidate_list = resp.get("models") or resp.get("model") or resp.get("data") or []
-        for m in candidate_list or []:
-            name = m.get("name") or m.get("id") if isinstance(m, dict) else getattr(m, "name", None) or getattr(m, "id", None)
-            if name:
-                models.append(name)
-
-    # If resp is a list or similar
-    elif isinstance(resp, list):
-        for m in resp:
-            name = m.get("name") if isinstance(m, dict) else getattr(m, "name", None) or getattr(m, "id", None)
+    try:
+        pager = client.models.list()
+        for m in pager:
+            # model objects often have 'name' or 'id'
+            name = getattr(m, "name", None) or getattr(m, "id", None)
             if name:
                 models.append(name)
+    except Exception as e:
+        raise RuntimeError(f"Could not list models: client.models.list() -> {e}")
 
-    else:
-        # Attempt to iterate (e.g., Pager object) and extract model names
-        try:
-            for m in resp:
-                name = None
-                if isinstance(m, dict):
-                    name = m.get("name") or m.get("id")
-                else:
-                    # model objects often have 'name' or 'id'
-                    name = getattr(m, "name", None) or getattr(m, "id", None)
-                if name:
-                    models.append(name)
-        except Exception:
-            # Fall back to inspecting attributes
-            candidate_list = getattr(resp, "models", None) or getattr(resp, "data", None) or getattr(resp, "model", None) or []
-            for m in candidate_list or []:
-                name = m.get("name") if isinstance(m, dict) else getattr(m, "name", None) or getattr(m, "id", None)
-                if name:
-                    models.append(name)
-
-    if not models:
-        st.sidebar.info("No models returned by the API. Check that your key has Gemini Pro access and call ListModels output for supported methods.")
-
-    return sorted(set(models))
+    # Drop duplicates but keep the order the API returned them in
+    return list(dict.fromkeys(models))
 
 
 # Attempt to populate model selector if API key is provided
 available_models = []
 if api_key:
-    with st.spinner("Loading available models..."):
+    try:
         available_models = list_models(api_key)
+    except Exception as e:
+        st.sidebar.error(str(e))
+    else:
+        if not available_models:
+            st.sidebar.info("No models returned by the API. Check that your key has Gemini Pro access and call ListModels output for supported methods.")
 
 # Prefer a sensible default if present
+DEFAULT_MODEL = "models/gemini-pro-latest"
+
+def _pick_default(models):
+    """Return the index of DEFAULT_MODEL in ``models``, or 0 if it is missing."""
+    return next((i for i, m in enumerate(models) if m == DEFAULT_MODEL), 0)
+
 if available_models:
-    try:
-        default_index = available_models.index("models/gemini-pro-latest")
-    except ValueError:
-        default_index = 0
-    model_choice = st.sidebar.selectbox("Choose model", options=available_models, index=default_index)
+    model_choice = st.sidebar.selectbox("Choose model", options=available_models, index=_pick_default(available_models))
 else:
     model_choice = st.sidebar.selectbox("Choose model", options=["(enter API key to load models)"])
 
 st.sidebar.markdown("**Tip:** If you get 404 NOT_FOUND, pick a model from the list above (e.g., `models/gemini-pro-latest`) — `gemini-1.5-pro-latest` may not exist for this API/version.")
 
 # ---------------- DEBUG / DIAGNOSTICS ----------------
-def list_models_debug(api_key):
-    """Run multiple ListModels call shapes and return raw summaries and any errors."""
+@st.cache_data(ttl=3600, show_spinner="Probing ListModels call shapes...")
+def list_models_debug(api_key, with_tb=False):
+    """Run multiple ListModels call shapes and return raw summaries and any errors.
+
+    Tracebacks are only formatted when ``with_tb`` is set.
+    """
     try:
-        client = genai.Client(api_key=api_key)
+        client = get_client(api_key)
     except Exception as e:
-        return {"error": f"Client init error: {e}", "traceback": traceback.format_exc()}
+        return {"error": f"Client init error: {e}", "traceback": traceback.format_exc() if with_tb else ""}
 
     attempts = []
 
@@ -156,20 +133,28 @@ def list_models_debug(api_key):
 
             attempts.append({"name": name, "ok": True, "summary": summary})
         except Exception as e:
-            attempts.append({"name": name, "ok": False, "error": str(e), "traceback": traceback.format_exc()})
+            attempts.append({"name": name, "ok": False, "error": str(e), "traceback": traceback.format_exc() if with_tb else ""})
 
-    models = list_models(api_key)
-    return {"attempts": attempts, "models": models}
+    return {"attempts": attempts}
 
 
 with st.expander("🔎 Debug model listing"):
     if not api_key:
         st.info("Enter API key to run model listing debug")
     else:
-        debug = list_models_debug(api_key)
-        if debug.get("error"):
+        with_tb = st.checkbox("Include tracebacks", value=False)
+        # Only probe on an explicit click; keep the last result across reruns,
+        # tagged with the key it was run for
+        if st.button("Run diagnostics"):
+            st.session_state["debug_result"] = (api_key, list_models_debug(api_key, with_tb=with_tb))
+
+        debug_key, debug = st.session_state.get("debug_result", (None, None))
+        if debug_key != api_key:
+            st.caption("Click to probe the ListModels call shapes for this key.")
+        elif debug.get("error"):
             st.error(debug["error"])
-            st.text(debug["traceback"])
+            if debug.get("traceback"):
+                st.text(debug["traceback"])
         else:
             for a in debug.get("attempts", []):
                 if a.get("ok"):
@@ -178,9 +163,11 @@ with st.expander("🔎 Debug model listing"):
                 else:
                     st.error(a.get("name"))
                     st.text(a.get("error"))
-                    st.text(a.get("traceback"))
+                    if a.get("traceback"):
+                        st.text(a.get("traceback"))
 
-            st.write("Parsed models:", debug.get("models"))
+            # Parsed models come from the cached list_models call above
+            st.write("Parsed models:", available_models)
 
 # ---------------- USER INPUT ----------------
 topic = st.text_input(
@@ -189,10 +176,7 @@ topic = st.text_input(
 )
 
 # ---------------- GEMINI FUNCTION ----------------
-def run_gemini(api_key, topic, model_name):
-    client = genai.Client(api_key=api_key)
-
-    prompt = f"""
+PROMPT_TEMPLATE = """
 You are a professional academic research assistant.
 
 Write a detailed research report on:
@@ -210,50 +194,150 @@ Include:
 Use simple English.
 """
 
-    # Primary attempt: use the SDK's generate_content if available for the model
+# Seconds a finished report is served from cache for the same (topic, model)
+REPORT_CACHE_TTL = 86400
+# Oldest reports are evicted once the cache holds this many
+REPORT_CACHE_MAX_ENTRIES = 200
+
+def no_text_reason(response):
+    """Describe why a response (or its last streamed chunk) carried no text."""
+    feedback = getattr(response, "prompt_feedback", None)
+    block_reason = getattr(feedback, "block_reason", None)
+    if block_reason:
+        return f"block reason: {block_reason}"
+    candidates = getattr(response, "candidates", None) or []
+    finish_reason = getattr(candidates[0], "finish_reason", None) if candidates else None
+    if finish_reason:
+        return f"finish reason: {finish_reason}"
+    return "no block or finish reason reported"
+
+def gemini_error(e):
+    """Translate an SDK exception into a RuntimeError with a clear message."""
+    msg = str(e)
+    # If model isn't available for generate_content, give a clear error message.
+    if "not found" in msg.lower() or "not supported for generatecontent" in msg.lower():
+        return RuntimeError(
+            "Selected model does not support `generate_content` for this API/version. "
+            "Call ListModels and choose a model that supports text generation or use a different SDK method."
+        )
+    if "resource_exhausted" in msg.lower() or "quota" in msg.lower() or "429" in msg:
+        return RuntimeError(
+            "Quota exhausted or insufficient billing for this model. "
+            "Enable billing or request quota for generative requests at https://ai.google.dev/gemini-api/docs/rate-limits and monitor usage at https://ai.dev/usage?tab=rate-limit."
+        )
+    # Include the traceback for other unexpected exceptions to help debugging
+    tb = "".join(traceback.format_exception(type(e), e, e.__traceback__))
+    return RuntimeError(f"Unexpected error calling model: {e}\n\n{tb}")
+
+def run_gemini(api_key, topic, model_name):
+    """Yield the research report text chunk by chunk as Gemini streams it."""
+    client = get_client(api_key)
+    prompt = PROMPT_TEMPLATE.format(topic=topic)
+
+    # Stream the response so the first tokens render while the rest generate
+    yielded = False
+    chunk = None
     try:
-        response = client.models.generate_content(
+        stream = client.models.generate_content_stream(
             model=model_name,
             contents=prompt
         )
-        # Many SDK shapes expose `.text` or `.content` — be defensive
-        return getattr(response, "text", None) or getattr(response, "content", None) or str(response)
+        for chunk in stream:
+            # Chunks without text (e.g. safety or usage metadata) are skipped
+            text = getattr(chunk, "text", None)
+            if text:
+                yielded = True
+                yield text
 
     except Exception as e:
-        # If model isn't available for generate_content, give a clear error message.
-        msg = str(e)
-        if "not found" in msg.lower() or "not supported for generatecontent" in msg.lower():
-            raise RuntimeError(
-                "Selected model does not support `generate_content` for this API/version. "
-                "Call ListModels and choose a model that supports text generation or use a different SDK method."
-            )
-        if "resource_exhausted" in msg.lower() or "quota" in msg.lower() or "429" in msg:
-            raise RuntimeError(
-                "Quota exhausted or insufficient billing for this model. "
-                "Enable billing or request quota for generative requests at https://ai.google.dev/gemini-api/docs/rate-limits and monitor usage at https://ai.dev/usage?tab=rate-limit."
-            )
-        # Re-raise other unexpected exceptions with traceback to help debugging
-        tb = traceback.format_exc()
-        raise RuntimeError(f"Unexpected error calling model: {e}\n\n{tb}")
+        raise gemini_error(e)
+
+    # A blocked prompt or empty candidate streams no text at all
+    if not yielded:
+        raise RuntimeError(f"Model returned no text ({no_text_reason(chunk)}).")
+
+@st.cache_resource
+def _report_cache():
+    """Return the shared report dict, keyed by (topic, model_name), and its lock.
+
+    Sessions run on separate threads, so every read and write holds the lock.
+    """
+    return {}, threading.Lock()
+
+def _cached_report(key):
+    """Return the cached report for ``key``, or None if missing or expired."""
+    cache, lock = _report_cache()
+    with lock:
+        hit = cache.get(key)
+        if hit is None:
+            return None
+        if time.monotonic() - hit[0] >= REPORT_CACHE_TTL:
+            del cache[key]
+            return None
+        return hit[1]
+
+def _store_report(key, text):
+    """Add a finished report to the shared cache, dropping expired and excess entries."""
+    # Never cache an empty report; it would replay as a blank page for everyone
+    if not text:
+        return
+    cache, lock = _report_cache()
+    with lock:
+        # Re-inserting moves the key to the end, so iteration order stays oldest-first
+        cache.pop(key, None)
+        now = time.monotonic()
+        cache[key] = (now, text)
+        while cache:
+            oldest = next(iter(cache))
+            if len(cache) <= REPORT_CACHE_MAX_ENTRIES and now - cache[oldest][0] < REPORT_CACHE_TTL:
+                break
+            del cache[oldest]
+
+def research_report(api_key, topic, model_name):
+    """Yield the report for (topic, model_name), replaying a cached copy while fresh.
+
+    st.cache_data would block until the whole response arrived, so completed
+    streams are stored here instead. The API key is not part of the cache key.
+    """
+    key = (topic, model_name)
+    text = _cached_report(key)
+    if text is not None:
+        yield text
+        return
+
+    parts = []
+    for text in run_gemini(api_key, topic, model_name):
+        parts.append(text)
+        yield text
+    # Only reached when the stream finished without error
+    _store_report(key, "".join(parts))
 
 # ---------------- WORD EXPORT ----------------
+# A paragraph is a run of non-empty lines joined by single newlines
+PARAGRAPH_RE = re.compile(r"[^\n]+(?:\n(?!\n)[^\n]+)*")
+
+@st.cache_data(ttl=3600, show_spinner=False)
 def make_word_document(topic, content):
-    """Return a BytesIO containing a .docx file for the generated content."""
+    """Return the bytes of a .docx file for the generated content."""
     if not DOCX_AVAILABLE:
         raise RuntimeError("python-docx not installed. Install with: pip install python-docx")
+    from docx import Document
+
     doc = Document()
     doc.add_heading(topic, level=1)
-    # Split into paragraphs by double-newline to keep structure
-    for block in content.split("\n\n"):
-        block = block.strip()
+    # Iterate paragraphs separated by blank lines without building a list of them
+    for match in PARAGRAPH_RE.finditer(content):
+        block = match.group(0).strip()
         if block:
             doc.add_paragraph(block)
     bio = io.BytesIO()
     doc.save(bio)
-    bio.seek(0)
-    return bio
+    return bio.getvalue()
 
 # ---------------- BUTTON ----------------
+# True only on the rerun where the report was just streamed onto the page
+generated = False
+
 if st.button("🚀 Start Research"):
     if not api_key:
         st.warning("Please enter API key")
@@ -264,32 +348,141 @@ if st.button("🚀 Start Research"):
     else:
         with st.spinner("Generating research..."):
             try:
-                output = run_gemini(api_key, topic, model_choice)
-
                 st.subheader("📘 Research Output")
-                st.write(output)
+                output = st.write_stream(research_report(api_key, topic, model_choice))
 
-                st.download_button(
-                    "⬇️ Download Report",
-                    output,
-                    file_name=f"{topic.replace(' ', '_')}.txt"
-                )
-
-                # DOCX download button
+                # Keep the report so later reruns can show it without calling Gemini
+                st.session_state["last_output"] = output
+                st.session_state["safe_name"] = topic.replace(" ", "_")
+                # Build both download payloads once; reruns reuse these bytes
+                st.session_state["txt_bytes"] = output.encode("utf-8")
                 try:
-                    docx_bio = make_word_document(topic, output)
-                    st.download_button(
-                        "⬇️ Download as Word (.docx)",
-                        data=docx_bio.getvalue(),
-                        file_name=f"{topic.replace(' ', '_')}.docx",
-                        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-                    )
-                except Exception as e:
-                    st.info("Enable Word export: run `pip install python-docx` in your venv")
+                    st.session_state["docx_bytes"] = make_word_document(topic, output)
+                except Exception:
+                    st.session_state["docx_bytes"] = None
+                generated = True
 
             except Exception as e:
+                for key in ("last_output", "safe_name", "txt_bytes", "docx_bytes"):
+                    st.session_state.pop(key, None)
                 st.error(f"❌ Error: {e}")
 
+# ---------------- RESULT ----------------
+if "last_output" in st.session_state:
+    safe_name = st.session_state["safe_name"]
+
+    if not generated:
+        st.subheader("📘 Research Output")
+        st.write(st.session_state["last_output"])
+
+    st.download_button(
+        "⬇️ Download Report",
+        data=st.session_state["txt_bytes"],
+        file_name=f"{safe_name}.txt",
+        mime="text/plain"
+    )
+
+    # DOCX download button
+    if st.session_state["docx_bytes"] is not None:
+        st.download_button(
+            "⬇️ Download as Word (.docx)",
+            data=st.session_state["docx_bytes"],
+            file_name=f"{safe_name}.docx",
+            mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+        )
+    else:
+        st.info("Enable Word export: run `pip install python-docx` in your venv")
+
+# ---------------- MULTI-TOPIC ----------------
+# Upper bound on generate_content calls in flight during a multi-topic run
+MAX_PARALLEL_TOPICS = 5
+
+def run_gemini_many(api_key, topics, model_name):
+    """Generate reports for several topics concurrently.
+
+    Returns ``(topic, text, error)`` tuples in input order; ``error`` is None on
+    success. Fresh reports in the shared cache are reused, and new ones are
+    added to it.
+    """
+    texts = {}
+    for t in topics:
+        text = _cached_report((t, model_name))
+        if text is not None:
+            texts[t] = text
+    pending = [t for t in topics if t not in texts]
+
+    async def _run_all():
+        # Async transports are bound to the event loop that opened them, so
+        # each asyncio.run() gets its own client and an explicit httpx
+        # transport (which also keeps the SDK off aiohttp), closed before the
+        # loop is torn down. An explicit transport skips httpx's environment
+        # proxy lookup, so the HTTPS proxy is passed in by hand.
+        transport = httpx.AsyncHTTPTransport(
+            limits=HTTP_LIMITS,
+            proxy=urllib.request.getproxies().get("https"),
+        )
+        client = genai.Client(
+            api_key=api_key,
+            http_options=types.HttpOptions(async_client_args={"transport": transport}),
+        )
+        semaphore = asyncio.Semaphore(MAX_PARALLEL_TOPICS)
+
+        async def _one(t):
+            async with semaphore:
+                return await client.aio.models.generate_content(
+                    model=model_name,
+                    contents=PROMPT_TEMPLATE.format(topic=t)
+                )
+
+        try:
+            return await asyncio.gather(*[_one(t) for t in pending], return_exceptions=True)
+        finally:
+            await transport.aclose()
+
+    results = {}
+    if pending:
+        for t, r in zip(pending, asyncio.run(_run_all())):
+            # gather() can also return CancelledError, which is not an Exception
+            if isinstance(r, BaseException):
+                results[t] = (t, None, str(gemini_error(r)))
+            elif not getattr(r, "text", None):
+                results[t] = (t, None, f"Model returned no text ({no_text_reason(r)}).")
+            else:
+                _store_report((t, model_name), r.text)
+                texts[t] = r.text
+
+    return [results.get(t) or (t, texts[t], None) for t in topics]
+
+
+with st.expander("📚 Research several topics at once"):
+    topics_text = st.text_area("One topic per line")
+
+    if st.button("🚀 Research all topics"):
+        # Drop blank lines and repeated topics, keeping the entered order
+        topics = list(dict.fromkeys(t.strip() for t in topics_text.splitlines() if t.strip()))
+        if not api_key:
+            st.warning("Please enter API key")
+        elif not topics:
+            st.warning("Please enter at least one topic")
+        elif not model_choice or model_choice.startswith("("):
+            st.warning("Please choose a valid model from the sidebar")
+        else:
+            with st.spinner(f"Generating {len(topics)} reports..."):
+                st.session_state["batch_results"] = run_gemini_many(api_key, topics, model_choice)
+
+    for i, (t, text, error) in enumerate(st.session_state.get("batch_results", [])):
+        st.subheader(f"📘 {t}")
+        if error:
+            st.error(f"❌ Error: {error}")
+        else:
+            st.write(text)
+            st.download_button(
+                "⬇️ Download Report",
+                text,
+                file_name=f"{t.replace(' ', '_')}.txt",
+                key=f"batch_txt_{i}"
+            )
+
 # ---------------- FOOTER ----------------
 st.markdown("---")
 st.caption("Powered by Google Gemini 🚀")